@@ -22,14 +22,22 @@ SOFTWARE.
 import requests
 import logging
 import json
-from urllib.parse import urlencode
-from datetime import datetime
+from urllib.parse import urlencode, parse_qsl
+from datetime import datetime, timedelta
 from functools import reduce
 from pyvalid import accepts
 from pyvalid.validators import is_validator
-from re import match, fullmatch
+from re import match, fullmatch, findall
 from copy import copy
 from os.path import dirname, join
+from time import perf_counter, sleep, time
+from struct import Struct
+from mmap import mmap, ACCESS_READ
+import zlib
+import sqlite3
+from collections import OrderedDict
+from threading import Lock, Thread, Event
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 
 
@@ -295,12 +303,11 @@ class SearchCriteria:
             params['lang'] = self.lang
 
         # Parámetros para búsqueda por fecha de publicación
-        formatted_date = lambda date:'{}Z'.format(date.isoformat('T'))
         if not self.published_before is None:
-            params['published_before'] = formatted_date(self.published_before)
+            params['published_before'] = self._format_date(self.published_before)
 
         if not self.published_after is None:
-            params['published_after'] = formatted_date(self.published_after)
+            params['published_after'] = self._format_date(self.published_after)
 
         # Parámetro para búsqueda por fuentes de información.
         if not self.sources is None:
@@ -324,6 +331,15 @@ class SearchCriteria:
         return params
 
 
+    @staticmethod
+    def _format_date(date):
+        '''
+        Formatea una fecha (instancia de datetime, UTC) tal y como la espera la API
+        BBC Juice en los parámetros published_before y published_after
+        '''
+        return '{}Z'.format(date.isoformat('T'))
+
+
 
 
 class Article:
@@ -331,11 +347,12 @@ class Article:
     Esta clase proporciona información relevante de los articulos
     devueltos por la API BBC Juice
     '''
-    @accepts(object, int, str, datetime)
-    def __init__(self, id, url, published_at):
+    @accepts(object, int, str, datetime, (dict, type(None)))
+    def __init__(self, id, url, published_at, data = None):
         self.id = id
         self.url = url
         self.published_at = published_at
+        self.data = data if not data is None else {}
 
     def get_id(self):
         '''
@@ -360,6 +377,14 @@ class Article:
         '''
         return self.published_at
 
+    def get_field(self, name, default = None):
+        '''
+        :param name: Es el nombre de un campo del articulo en la respuesta de la API
+        BBC Juice (p.ej, 'title' o 'body')
+        :return: Devuelve el valor del campo indicado, o default si la respuesta no lo incluía
+        '''
+        return self.data.get(name, default)
+
     def get_domain(self):
         '''
 
@@ -402,6 +427,814 @@ class Source:
         return self.get_name()
 
 
+class PageSizeController:
+    '''
+    Ajusta el tamaño de página usado al paginar articulos a partir del tiempo de respuesta,
+    el tamaño del cuerpo de las respuestas y la tasa de errores observados, de forma que el
+    tiempo de respuesta de cada request se aproxime a un valor objetivo.
+    '''
+    @accepts(object, initial_size = int, min_size = int, max_size = int,
+             target_latency = (int, float), max_bytes = (int, type(None)), max_error_rate = (int, float))
+    def __init__(self, initial_size = 10, min_size = 1, max_size = 100, target_latency = 1.0,
+                 max_bytes = None, max_error_rate = 0.1):
+        '''
+        Inicializa la instancia.
+        :param initial_size: Es el tamaño de página de la primera request. Por defecto, 10
+        :param min_size: Es el tamaño de página mínimo. Por defecto, 1
+        :param max_size: Es el tamaño de página máximo. Por defecto, 100
+        :param target_latency: Es el tiempo de respuesta objetivo en segundos. Por defecto, 1
+        :param max_bytes: Si se indica, es el tamaño máximo en bytes que debería tener el
+        cuerpo de cada respuesta.
+        :param max_error_rate: Mientras la tasa de errores (media móvil exponencial) supere este
+        valor, el tamaño de página no se incrementa. Por defecto, 0.1
+        '''
+        if not 1 <= min_size <= initial_size <= max_size:
+            raise ValueError('Page size bounds must satisfy 1 <= min_size <= initial_size <= max_size')
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self.max_bytes = max_bytes
+        self.max_error_rate = max_error_rate
+
+        self.size = initial_size
+        self.error_rate = 0.0
+
+        # Métricas
+        self.sizes = []
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.total_bytes = 0
+
+    def get_size(self):
+        '''
+        :return: Devuelve el tamaño de página que debe usarse en la siguiente request
+        '''
+        return self.size
+
+    def update(self, latency = None, num_bytes = None, count = None, error = False):
+        '''
+        Actualiza el tamaño de página con la información de la última request.
+        :param latency: Es el tiempo de respuesta de la request en segundos
+        :param num_bytes: Es el tamaño del cuerpo de la respuesta en bytes
+        :param count: Es el número de articulos devueltos en la respuesta
+        :param error: Debe ser True si la request ha fallado (p.ej, por timeout)
+        :return: Devuelve el nuevo tamaño de página
+        '''
+        self.sizes.append(self.size)
+        self.requests += 1
+        self.error_rate = 0.8 * self.error_rate + 0.2 * (1.0 if error else 0.0)
+
+        if error:
+            self.errors += 1
+            size = self.size / 2
+        else:
+            self.total_latency += latency
+            self.total_bytes += num_bytes
+
+            # Escalamos el tamaño de forma proporcional a la diferencia entre el tiempo de
+            # respuesta observado y el objetivo (como mucho duplicamos o dividimos a la mitad)
+            ratio = min(max(self.target_latency / max(latency, 1e-3), 0.5), 2.0)
+            if ratio > 1.0 and (self.error_rate > self.max_error_rate or (not count is None and count < self.size)):
+                # No crecemos si hay errores recientes o si la respuesta no llenó la página
+                ratio = 1.0
+            size = self.size * ratio
+
+            if not self.max_bytes is None and count and num_bytes:
+                size = min(size, self.max_bytes / (num_bytes / count))
+
+        self.size = int(min(max(size, self.min_size), self.max_size))
+        return self.size
+
+    def get_metrics(self):
+        '''
+        :return: Devuelve un diccionario con métricas de las requests realizadas y los tamaños
+        de página elegidos
+        '''
+        successes = self.requests - self.errors
+        return {
+            'size' : self.size,
+            'sizes' : list(self.sizes),
+            'requests' : self.requests,
+            'errors' : self.errors,
+            'error_rate' : self.errors / self.requests if self.requests > 0 else 0.0,
+            'mean_latency' : self.total_latency / successes if successes > 0 else None,
+            'mean_bytes' : self.total_bytes / successes if successes > 0 else None
+        }
+
+
+class TransportResponse:
+    '''
+    Representa la respuesta a una request realizada por un transporte (ver la clase
+    Transport). Ofrece la misma interfaz que las respuestas de la librería requests que
+    usa la clase Juipy.
+    '''
+    def __init__(self, status_code, headers, content, elapsed = 0.0):
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.elapsed = elapsed
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8'))
+
+
+class Transport:
+    '''
+    Clase base de los transportes que usa la clase Juipy para realizar las requests
+    HTTP a la API BBC Juice.
+    '''
+    def get(self, url, headers = None, timeout = None):
+        '''
+        Realiza una request GET.
+        :return: Devuelve la respuesta (una instancia de TransportResponse o un objeto con la
+        misma interfaz)
+        '''
+        raise NotImplementedError()
+
+    def close(self):
+        '''
+        Libera los recursos del transporte.
+        '''
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @staticmethod
+    def _request_key(url):
+        '''
+        :return: Devuelve la url normalizada (sin la API key y con los parámetros ordenados)
+        que identifica una request en un archivo de grabación
+        '''
+        url, _, query = url.partition('?')
+        params = sorted([(key, value) for key, value in parse_qsl(query, keep_blank_values = True) if key != 'api_key'])
+        return '{}?{}'.format(url, urlencode(params))
+
+
+class HttpTransport(Transport):
+    '''
+    Transporte que realiza las requests sobre la API mediante la librería requests,
+    reutilizando las conexiones.
+    '''
+    def __init__(self):
+        self.session = requests.Session()
+
+    def get(self, url, headers = None, timeout = None):
+        return self.session.get(url, headers = headers, timeout = timeout)
+
+    def close(self):
+        self.session.close()
+
+
+class RecordingTransport(Transport):
+    '''
+    Transporte que realiza las requests con otro transporte y guarda cada request y su
+    respuesta en un archivo de grabación, que después puede reproducirse con la clase
+    ReplayTransport.
+
+    El archivo consta de un registro por respuesta (cabecera con las longitudes, metadatos en
+    JSON y cuerpo comprimido con zlib) seguidos de un índice que asocia cada request con la
+    posición de sus respuestas. El índice se escribe al invocar el método close()
+    '''
+    magic = b'JUIPYREC'
+    record_header = Struct('<II')
+    trailer = Struct('<Q8s')
+
+    def __init__(self, path, transport = None):
+        '''
+        Inicializa la instancia.
+        :param path: Es la ruta del archivo de grabación (se sobreescribe si ya existe)
+        :param transport: Es el transporte que realizará las requests. Por defecto, una
+        instancia de HttpTransport
+        '''
+        self.transport = transport if not transport is None else HttpTransport()
+        self.file = open(path, 'wb')
+        self.file.write(self.magic)
+        self.index = {}
+        self.lock = Lock()
+
+    def get(self, url, headers = None, timeout = None):
+        # Se eliminan las cabeceras de las requests condicionales para que la grabación solo
+        # contenga respuestas completas y no dependa de la caché del cliente que la reproduzca
+        headers = dict((key, value) for key, value in (headers or {}).items()
+                       if key.lower() not in ('if-none-match', 'if-modified-since'))
+
+        start = perf_counter()
+        response = self.transport.get(url, headers = headers, timeout = timeout)
+        elapsed = perf_counter() - start
+
+        meta = json.dumps({
+            'url' : self._request_key(url),
+            'status_code' : response.status_code,
+            'headers' : dict(response.headers),
+            'elapsed' : elapsed
+        }).encode('utf-8')
+        body = zlib.compress(response.content)
+
+        with self.lock:
+            offset = self.file.tell()
+            self.file.write(self.record_header.pack(len(meta), len(body)))
+            self.file.write(meta)
+            self.file.write(body)
+            self.index.setdefault(self._request_key(url), []).append(offset)
+        return response
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            offset = self.file.tell()
+            self.file.write(json.dumps(self.index).encode('utf-8'))
+            self.file.write(self.trailer.pack(offset, self.magic))
+            self.file.close()
+        self.transport.close()
+
+
+class ReplayTransport(Transport):
+    '''
+    Transporte que sirve las respuestas guardadas en un archivo de grabación (ver la clase
+    RecordingTransport) sin acceder a la API. El archivo se proyecta en memoria.
+    Si una misma request se grabó varias veces, sus respuestas se devuelven en el mismo
+    orden; una vez agotadas, se repite la última.
+    '''
+    def __init__(self, path, replay_latency = False):
+        '''
+        Inicializa la instancia.
+        :param path: Es la ruta del archivo de grabación
+        :param replay_latency: Si es True, cada respuesta se devuelve tras esperar el mismo
+        tiempo que tardó la request original. Por defecto, False
+        '''
+        self.replay_latency = replay_latency
+        with open(path, 'rb') as file:
+            self.data = mmap(file.fileno(), 0, access = ACCESS_READ)
+
+        if self.data[:len(RecordingTransport.magic)] != RecordingTransport.magic:
+            raise Exception('{} is not a juipy recording'.format(path))
+
+        trailer = RecordingTransport.trailer
+        index_offset, magic = trailer.unpack_from(self.data, len(self.data) - trailer.size) \
+            if len(self.data) >= len(RecordingTransport.magic) + trailer.size else (0, None)
+        if magic == RecordingTransport.magic:
+            self.index = json.loads(self.data[index_offset:len(self.data) - trailer.size].decode('utf-8'))
+        else:
+            # La grabación no se cerró correctamente, reconstruimos el índice
+            self.index = self._scan()
+
+        self.cursors = {}
+        self.lock = Lock()
+
+    def _scan(self):
+        '''
+        :return: Devuelve el índice de una grabación incompleta, recorriendo sus registros
+        '''
+        index = {}
+        header = RecordingTransport.record_header
+        offset = len(RecordingTransport.magic)
+        while offset + header.size <= len(self.data):
+            meta_length, body_length = header.unpack_from(self.data, offset)
+            end = offset + header.size + meta_length + body_length
+            if end > len(self.data):
+                break
+            meta = json.loads(self.data[offset + header.size:offset + header.size + meta_length].decode('utf-8'))
+            index.setdefault(meta['url'], []).append(offset)
+            offset = end
+        return index
+
+    def get(self, url, headers = None, timeout = None):
+        key = self._request_key(url)
+        with self.lock:
+            offsets = self.index.get(key)
+            if offsets is None:
+                raise Exception('No recorded response for {}'.format(key))
+            cursor = self.cursors.get(key, 0)
+            self.cursors[key] = cursor + 1
+        offset = offsets[min(cursor, len(offsets) - 1)]
+
+        header = RecordingTransport.record_header
+        meta_length, body_length = header.unpack_from(self.data, offset)
+        start = offset + header.size
+        meta = json.loads(self.data[start:start + meta_length].decode('utf-8'))
+        content = zlib.decompress(self.data[start + meta_length:start + meta_length + body_length])
+
+        if self.replay_latency:
+            sleep(meta['elapsed'])
+        return TransportResponse(meta['status_code'], meta['headers'], content, meta['elapsed'])
+
+    def close(self):
+        self.data.close()
+
+
+class BatchResult:
+    '''
+    Representa el resultado de uno de los criterios de búsqueda de una búsqueda por lotes
+    (ver el método Juipy.search_many)
+    '''
+    def __init__(self, criteria, articles = None, error = None, elapsed = 0.0):
+        self.criteria = criteria
+        self.articles = articles
+        self.error = error
+        self.elapsed = elapsed
+
+    def get_criteria(self):
+        '''
+        :return: Devuelve el criterio de búsqueda (instancia de SearchCriteria)
+        '''
+        return self.criteria
+
+    def get_articles(self):
+        '''
+        :return: Devuelve la lista de articulos encontrados, o None si la búsqueda falló
+        '''
+        return self.articles
+
+    def get_error(self):
+        '''
+        :return: Devuelve la excepción generada si la búsqueda falló, o None en caso contrario
+        '''
+        return self.error
+
+    def get_elapsed(self):
+        '''
+        :return: Devuelve el tiempo en segundos que tardó la búsqueda
+        '''
+        return self.elapsed
+
+    def succeeded(self):
+        '''
+        :return: Devuelve True si la búsqueda se realizó correctamente
+        '''
+        return self.error is None
+
+
+class ArticleIndex:
+    '''
+    Índice invertido en memoria sobre articulos ya consultados. Permite evaluar localmente
+    criterios de búsqueda (keywords, facets, fechas de publicación, lenguaje y fuentes) sin
+    realizar requests a la API BBC Juice.
+    '''
+    @accepts(object, text_fields = (list, tuple), facet_fields = (list, tuple), source_field = str)
+    def __init__(self, text_fields = ('title', 'description', 'body'), facet_fields = ('annotations',),
+                 source_field = 'source'):
+        '''
+        Inicializa la instancia.
+        :param text_fields: Son los campos de los articulos cuyo texto se indexa para buscar
+        keywords. Por defecto, 'title', 'description' y 'body'
+        :param facet_fields: Son los campos de los articulos que contienen las entidades de DBPedia
+        a las que hacen referencia. Cada campo debe ser una lista de URIs (strings) o de
+        diccionarios con la clave 'uri'. Por defecto, 'annotations'
+        :param source_field: Es el campo que indica la fuente de información del articulo: una ID
+        o un diccionario con las claves 'id' y/o 'name'. Por defecto, 'source'
+        '''
+        self.text_fields = text_fields
+        self.facet_fields = facet_fields
+        self.source_field = source_field
+
+        self.articles = {}
+        # Token -> {ID de articulo -> posiciones del token en el articulo}
+        self.postings = {}
+        # Entidad -> IDs de articulos
+        self.facets = {}
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.articles)
+
+    @staticmethod
+    def _tokenize(text):
+        return findall(r'\w+', text.lower())
+
+    @staticmethod
+    def _facet_name(facet):
+        '''
+        :return: Devuelve el nombre de la entidad de una URI de DBPedia
+        (p.ej, 'http://dbpedia.org/resource/Barack_Obama' -> 'Barack_Obama')
+        '''
+        return facet.rstrip('/').rsplit('/', 1)[-1]
+
+    def _article_facets(self, article):
+        facets = set()
+        for field in self.facet_fields:
+            values = article.get_field(field)
+            if not isinstance(values, list):
+                continue
+            for value in values:
+                uri = value.get('uri') if isinstance(value, dict) else value
+                if isinstance(uri, str):
+                    facets.add(self._facet_name(uri))
+        return facets
+
+    def add(self, articles):
+        '''
+        Añade articulos al índice. Si un articulo ya estaba indexado, se reemplaza.
+        :param articles: Una instancia de la clase Article o una lista de ellas
+        '''
+        if isinstance(articles, Article):
+            articles = [articles]
+
+        with self.lock:
+            for article in articles:
+                if article.get_id() in self.articles:
+                    self._remove(article.get_id())
+
+                id = article.get_id()
+                self.articles[id] = article
+
+                # Separamos los campos para que una frase no pueda empezar en un campo y
+                # acabar en el siguiente
+                position = 0
+                for field in self.text_fields:
+                    text = article.get_field(field)
+                    if not isinstance(text, str):
+                        continue
+                    for token in self._tokenize(text):
+                        self.postings.setdefault(token, {}).setdefault(id, []).append(position)
+                        position += 1
+                    position += 1
+
+                for facet in self._article_facets(article):
+                    self.facets.setdefault(facet, set()).add(id)
+
+    def remove(self, id):
+        '''
+        Elimina un articulo del índice
+        :param id: Es la ID del articulo
+        '''
+        with self.lock:
+            if id in self.articles:
+                self._remove(id)
+
+    def _remove(self, id):
+        article = self.articles.pop(id)
+        for field in self.text_fields:
+            text = article.get_field(field)
+            if not isinstance(text, str):
+                continue
+            for token in set(self._tokenize(text)):
+                postings = self.postings.get(token)
+                if not postings is None:
+                    postings.pop(id, None)
+                    if len(postings) == 0:
+                        del self.postings[token]
+
+        for facet in self._article_facets(article):
+            ids = self.facets.get(facet)
+            if not ids is None:
+                ids.discard(id)
+                if len(ids) == 0:
+                    del self.facets[facet]
+
+    def _match_phrase(self, phrase):
+        '''
+        :return: Devuelve las IDs de los articulos que contienen la frase indicada
+        '''
+        tokens = self._tokenize(phrase)
+        if len(tokens) == 0:
+            return set()
+
+        postings = [self.postings.get(token, {}) for token in tokens]
+        ids = reduce(lambda x, y: x & y, [set(posting) for posting in postings])
+        if len(tokens) == 1:
+            return ids
+
+        # Comprobamos que los tokens aparecen de forma consecutiva
+        matches = set()
+        for id in ids:
+            positions = [set(posting[id]) for posting in postings]
+            if any(all(start + offset in positions[offset] for offset in range(1, len(tokens)))
+                   for start in positions[0]):
+                matches.add(id)
+        return matches
+
+    def _match_keywords(self, keywords):
+        '''
+        Evalúa una keyword, fórmula de keywords o lista de ellas (se combinan con AND)
+        :return: Devuelve las IDs de los articulos que cumplen la condición
+        '''
+        if isinstance(keywords, str):
+            return self._match_phrase(keywords)
+        if isinstance(keywords, Keyword):
+            return self._match_phrase(keywords.name)
+        if isinstance(keywords, KeywordsFormula):
+            A, B = self._match_keywords(keywords.clauseA), self._match_keywords(keywords.clauseB)
+            return A & B if keywords.op == 'and' else A | B
+        if isinstance(keywords, list):
+            if len(keywords) == 0:
+                return set(self.articles)
+            return reduce(lambda x, y: x & y, [self._match_keywords(keyword) for keyword in keywords])
+        raise ValueError()
+
+    def _match_sources(self, article, sources):
+        source = article.get_field(self.source_field)
+        if isinstance(source, dict):
+            values = {source.get('id'), source.get('name')}
+        else:
+            values = {source}
+        values.discard(None)
+        return len(values & set(sources)) > 0
+
+    @accepts(object, criteria = SearchCriteria)
+    def search(self, criteria = None, *args, **kwargs):
+        '''
+        Busca articulos en el índice.
+        :param criteria: Debe ser una instancia de la clase SearchCriteria. Indicará
+        el criterio de búsqueda. Los parámetros like_text y like_ids no pueden evaluarse
+        localmente.
+        Si se filtra por lenguaje o por fuentes de información, los articulos que no incluyen el
+        campo 'lang' o el campo de la fuente (ver source_field) no cumplen el criterio.
+        Si es None, se podrán especificar los mismos parámetros que los que se utilizan para
+        inicializar una instancia de la clase SearchCriteria.
+        :return: Devuelve la lista de articulos que cumplen el criterio, ordenados por fecha de
+        publicación
+        '''
+        if criteria is None:
+            criteria = SearchCriteria(*args, **kwargs)
+
+        if not criteria.like_text is None or not criteria.like_ids is None:
+            raise Exception('like_text and like_ids can not be evaluated locally')
+
+        with self.lock:
+            ids = set(self.articles) if criteria.keywords is None else self._match_keywords(criteria.keywords)
+
+            if not criteria.facets is None:
+                facets = criteria.facets if isinstance(criteria.facets, list) else [criteria.facets]
+                ids &= reduce(lambda x, y: x | y, [self.facets.get(facet, set()) for facet in facets], set())
+
+            articles = [self.articles[id] for id in ids]
+
+        if not criteria.published_after is None:
+            articles = [article for article in articles if article.get_published_at() >= criteria.published_after]
+        if not criteria.published_before is None:
+            articles = [article for article in articles if article.get_published_at() <= criteria.published_before]
+        if not criteria.lang is None:
+            articles = [article for article in articles if article.get_field('lang') == criteria.lang]
+        if not criteria.sources is None:
+            sources = criteria.sources if isinstance(criteria.sources, list) else [criteria.sources]
+            articles = [article for article in articles if self._match_sources(article, sources)]
+
+        return sorted(articles, key = lambda article: article.get_published_at())
+
+
+class CrawlShard:
+    '''
+    Representa una parte de un crawl (fuente de información x intervalo de fechas x offset)
+    cedida a un worker por una instancia de la clase CrawlCoordinator
+    '''
+    def __init__(self, id, params, since, worker):
+        self.id = id
+        self.params = params
+        self.since = since
+        self.worker = worker
+
+    def get_id(self):
+        '''
+        :return: Devuelve la ID de la shard en la cola de trabajo
+        '''
+        return self.id
+
+    def get_params(self, size):
+        '''
+        :param size: Es el número de articulos a consultar
+        :return: Devuelve los parámetros de la query de articulos de esta shard
+        '''
+        params = copy(self.params)
+        params.update({'size' : size, 'since' : self.since})
+        return params
+
+
+class CrawlCoordinator:
+    '''
+    Reparte un crawl entre varios workers (procesos o máquinas) mediante una cola de trabajo
+    compartida, guardada en una base de datos SQLite.
+    El crawl se divide en shards (fuente de información x intervalo de fechas x offset). Cada
+    worker obtiene shards en préstamo durante un tiempo limitado (lease), que renueva
+    periódicamente mientras las procesa. Si un worker falla, sus shards vuelven a la cola cuando
+    expira el préstamo.
+    '''
+    @accepts(object, str, lease_time = (int, float), max_attempts = int)
+    def __init__(self, path, lease_time = 60, max_attempts = 3):
+        '''
+        Inicializa la instancia.
+        :param path: Es la ruta de la base de datos SQLite. Todos los workers deben usar la misma.
+        :param lease_time: Es la duración en segundos del préstamo de una shard. Por defecto, 60
+        :param max_attempts: Es el número máximo de veces que se intentará procesar una shard
+        antes de marcarla como fallida. Por defecto, 3
+        '''
+        self.lease_time = lease_time
+        self.max_attempts = max_attempts
+
+        self.connection = sqlite3.connect(path, timeout = 30, isolation_level = None, check_same_thread = False)
+        self.lock = Lock()
+        with self.lock:
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS shards (
+                id INTEGER PRIMARY KEY,
+                key TEXT UNIQUE NOT NULL,
+                params TEXT NOT NULL,
+                since INTEGER NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0)''')
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS results (
+                shard_id INTEGER PRIMARY KEY,
+                worker TEXT NOT NULL,
+                article_ids TEXT NOT NULL,
+                committed_at REAL NOT NULL)''')
+            # Los intervalos de fechas consecutivos comparten el extremo, por lo que un articulo
+            # puede aparecer en varias shards. Solo se guarda la primera vez.
+            self.connection.execute('''CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY,
+                shard_id INTEGER NOT NULL)''')
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _add_shard(self, params, since):
+        key = json.dumps([params, since], sort_keys = True)
+        cursor = self.connection.execute('INSERT OR IGNORE INTO shards (key, params, since) VALUES (?, ?, ?)',
+                                         (key, json.dumps(params), since))
+        return cursor.rowcount
+
+    @accepts(object, object, SearchCriteria, window = timedelta)
+    def plan(self, juipy, criteria, window = timedelta(days = 1)):
+        '''
+        Divide un crawl en shards y las añade a la cola de trabajo. Se crea una shard por cada
+        fuente de información del criterio de búsqueda y cada intervalo de fechas.
+        Es seguro invocar este método desde varios workers: las shards que ya existen no se
+        duplican.
+        :param juipy: Es la instancia de la clase Juipy usada para traducir los nombres de las
+        fuentes de información a IDs
+        :param criteria: Es el criterio de búsqueda (instancia de SearchCriteria). Debe indicar
+        el parámetro published_after. Si no se indica published_before, se planifican los intervalos
+        que han terminado hasta la fecha actual; al invocar de nuevo este método se añadirán los
+        que terminen después.
+        :param window: Es la duración de los intervalos de fechas (instancia de
+        datetime.timedelta). Por defecto, 1 día
+        :return: Devuelve el número de shards añadidas
+        '''
+        if criteria.published_after is None:
+            raise Exception('published_after must be specified to plan a crawl')
+
+        params = criteria._parse()
+        juipy._resolve_sources(params)
+        sources = params.pop('sources[]', None)
+        sources = [None] if sources is None else sources if isinstance(sources, list) else [sources]
+
+        after = criteria.published_after
+        if not criteria.published_before is None:
+            before = criteria.published_before
+        else:
+            # Solo se planifican los intervalos ya completos, para que todos los workers
+            # generen las mismas shards
+            before = after + ((datetime.utcnow() - after) // window) * window
+
+        count = 0
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                for source in sources:
+                    start = after
+                    while start < before:
+                        end = min(start + window, before)
+                        shard_params = copy(params)
+                        shard_params.update({
+                            'published_after' : SearchCriteria._format_date(start),
+                            'published_before' : SearchCriteria._format_date(end)})
+                        if not source is None:
+                            shard_params['sources[]'] = source
+                        count += self._add_shard(shard_params, 0)
+                        start = end
+                self.connection.execute('COMMIT')
+            except:
+                self.connection.execute('ROLLBACK')
+                raise
+        return count
+
+    @accepts(object, str)
+    def lease(self, worker):
+        '''
+        Obtiene en préstamo la siguiente shard pendiente (o cuyo préstamo haya expirado)
+        :param worker: Es el identificador del worker
+        :return: Devuelve una instancia de la clase CrawlShard o None si no hay shards disponibles
+        '''
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                now = time()
+                # Las shards cuyo préstamo expiró demasiadas veces se marcan como fallidas
+                self.connection.execute('''UPDATE shards SET state = 'failed', worker = NULL
+                    WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?''', (now, self.max_attempts))
+                row = self.connection.execute('''SELECT id, params, since FROM shards
+                    WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?)
+                    ORDER BY id LIMIT 1''', (now,)).fetchone()
+                if not row is None:
+                    self.connection.execute('''UPDATE shards SET state = 'leased', worker = ?, lease_expires = ?,
+                        attempts = attempts + 1 WHERE id = ?''', (worker, now + self.lease_time, row[0]))
+                self.connection.execute('COMMIT')
+            except:
+                self.connection.execute('ROLLBACK')
+                raise
+
+        if row is None:
+            return None
+        return CrawlShard(row[0], json.loads(row[1]), row[2], worker)
+
+    def heartbeat(self, shard):
+        '''
+        Renueva el préstamo de una shard
+        :param shard: Es la instancia de CrawlShard devuelta por el método lease()
+        :return: Devuelve False si el worker ya no tiene la shard en préstamo
+        '''
+        with self.lock:
+            cursor = self.connection.execute('''UPDATE shards SET lease_expires = ?
+                WHERE id = ? AND worker = ? AND state = 'leased' ''', (time() + self.lease_time, shard.id, shard.worker))
+            return cursor.rowcount == 1
+
+    def commit(self, shard, article_ids, next_since = None):
+        '''
+        Marca una shard como completada y guarda su resultado.
+        :param shard: Es la instancia de CrawlShard devuelta por el método lease()
+        :param article_ids: Son las IDs de los articulos obtenidos
+        :param next_since: Si se indica, se añade a la cola una shard con los mismos parámetros
+        y este offset (la siguiente página de resultados)
+        :return: Devuelve la lista de IDs de articulos que no había guardado ninguna otra shard,
+        o None si el worker ya no tenía la shard en préstamo, en cuyo caso no se guarda el
+        resultado
+        '''
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                cursor = self.connection.execute('''UPDATE shards SET state = 'done', lease_expires = NULL
+                    WHERE id = ? AND worker = ? AND state = 'leased' ''', (shard.id, shard.worker))
+                if cursor.rowcount != 1:
+                    self.connection.execute('ROLLBACK')
+                    return None
+
+                self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                                        (shard.id, shard.worker, json.dumps(list(article_ids)), time()))
+                new_ids = [id for id in article_ids if self.connection.execute(
+                    'INSERT OR IGNORE INTO articles VALUES (?, ?)', (id, shard.id)).rowcount == 1]
+                if not next_since is None:
+                    self._add_shard(shard.params, next_since)
+                self.connection.execute('COMMIT')
+                return new_ids
+            except:
+                self.connection.execute('ROLLBACK')
+                raise
+
+    def release(self, shard):
+        '''
+        Devuelve una shard a la cola sin completarla (p.ej, porque la request falló). Si se
+        alcanzó el número máximo de intentos, la shard se marca como fallida.
+        :param shard: Es la instancia de CrawlShard devuelta por el método lease()
+        '''
+        with self.lock:
+            self.connection.execute('''UPDATE shards
+                SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, worker = NULL, lease_expires = NULL
+                WHERE id = ? AND worker = ? AND state = 'leased' ''', (self.max_attempts, shard.id, shard.worker))
+
+    def get_progress(self):
+        '''
+        :return: Devuelve un diccionario con el número de shards en cada estado ('pending',
+        'leased', 'done' y 'failed')
+        '''
+        with self.lock:
+            rows = self.connection.execute('SELECT state, COUNT(*) FROM shards GROUP BY state').fetchall()
+        progress = {'pending' : 0, 'leased' : 0, 'done' : 0, 'failed' : 0}
+        progress.update(rows)
+        return progress
+
+    def get_article_ids(self):
+        '''
+        :return: Devuelve las IDs de todos los articulos obtenidos por las shards completadas, sin
+        duplicados (un articulo publicado en el extremo de dos intervalos se obtiene en ambos)
+        '''
+        with self.lock:
+            rows = self.connection.execute('SELECT id FROM articles ORDER BY shard_id, id').fetchall()
+        return [row[0] for row in rows]
+
+
+class ServerResponseError(Exception):
+    '''
+    Excepción generada cuando la API BBC Juice responde con un código de estado distinto
+    de 200
+    '''
+    def __init__(self, status_code):
+        super().__init__('Server response with {}'.format(status_code))
+        self.status_code = status_code
+
+
 class Juipy:
     '''
     Esta clase permite obtener información de articulos, canales de TV y otras fuentes
@@ -411,20 +1244,43 @@ class Juipy:
     root_url = 'http://juicer.api.bbci.co.uk'
 
 
-    @accepts(object, api_key = str)
-    def __init__(self, api_key):
+    @accepts(object, api_key = str, http_cache_size = int, transport = (Transport, type(None)))
+    def __init__(self, api_key, http_cache_size = 256, transport = None):
         '''
         Inicializa la instancia.
         :param api_key: Debe ser la clave para la API BBC Juicer que usará para realizar
         las requests.
+        :param http_cache_size: Es el número máximo de respuestas que se guardarán para
+        realizar requests condicionales (con las cabeceras If-None-Match / If-Modified-Since).
+        Si es 0, no se realizan requests condicionales. Por defecto, 256
+        :param transport: Es el transporte que realizará las requests HTTP (una instancia de
+        la clase Transport). Puede usarse RecordingTransport para grabar las respuestas de la
+        API y ReplayTransport para reproducirlas sin conexión. Por defecto, una instancia de
+        HttpTransport
         '''
         self.api_key = api_key
+        self.transport = transport if not transport is None else HttpTransport()
 
         # Logger para mostrar información de depuración
         self.logger = logging.getLogger(__name__)
 
         # Información sobre las fuentes de información de BBC Juice
         self.sources = None
+        self.source_ids = None
+
+        # Respuestas previas (ETag, Last-Modified y cuerpo decodificado) de cada query
+        self.http_cache_size = http_cache_size
+        self.http_cache = OrderedDict()
+        self.http_cache_lock = Lock()
+
+        # Estadísticas de transferencia
+        self.transfer_stats = {
+            'requests' : 0,
+            'not_modified' : 0,
+            'bytes_received' : 0,
+            'bytes_saved_compression' : 0,
+            'bytes_saved_not_modified' : 0
+        }
 
     def get_logger(self):
         '''
@@ -433,6 +1289,15 @@ class Juipy:
         '''
         return self.logger
 
+    def get_transfer_stats(self):
+        '''
+        :return: Devuelve un diccionario con el número de requests realizadas, cuantas de ellas
+        se respondieron con 304 Not Modified, los bytes recibidos y los bytes ahorrados gracias a
+        la compresión y a las requests condicionales
+        '''
+        with self.http_cache_lock:
+            return dict(self.transfer_stats)
+
 
     @accepts(object, size = int, since = int, criteria = SearchCriteria)
     def search_articles(self, size = 10, since = 0, criteria = None, timeout = None, *args, **kwargs):
@@ -455,45 +1320,384 @@ class Juipy:
 
             # Que parámetros pasaremos a la query
             params = criteria._parse()
-            params.update({'size' : size, 'since' : 0})
+            params.update({'size' : size, 'since' : since})
 
             # El parámetro sources[] solo puede tener IDs y no nombres.
-            # Realizamos una conversión...
-            if ('sources[]' in params) and\
-                    (isinstance(params['sources[]'], str) or (isinstance(params['sources[]'],list) and len([source for source in params['sources[]'] if isinstance(source, str)]) > 0)):
-                if self.sources is None:
-                    try:
-                        self.sources = self.get_sources(timeout = 10)
-                    except:
-                        raise Exception('Failed to fetch source info data')
+            self._resolve_sources(params)
 
-                try:
-                    def get_source_id_by_name(name):
-                        return [source.get_id() for source in self.sources if source.get_name() == name][0]
+            # Hacemos la request
+            articles, total = self._search(params, timeout)
 
-                    names = params['sources[]']
-                    if isinstance(names, str):
-                        ids = get_source_id_by_name(names)
-                    else:
-                        ids = [get_source_id_by_name(name) for name in names]
+            # Avisamos si la API devolvió menos articulos de los pedidos aunque había más
+            if len(articles) < size and total > since + len(articles):
+                self.logger.warning('Search matched {} articles but only {} of {} requested were returned'.format(
+                    total, len(articles), size))
+            else:
+                self.logger.debug('Search matched {} articles, {} returned'.format(total, len(articles)))
+            return articles
+        except Exception as e:
+            raise Exception('Request to BBC juice ({}) failed: {}'.format('articles', *e.args))
 
-                    params['sources[]'] = ids
-                except:
-                    raise Exception('Failed to translate source names to IDs')
 
+    @accepts(object, criteria = SearchCriteria, max_hits = int, max_workers = int)
+    def search_all_articles(self, criteria = None, max_hits = 100, min_window = timedelta(minutes = 1),
+                            max_workers = 4, timeout = None, *args, **kwargs):
+        '''
+        Busca todos los articulos que cumplen un criterio de búsqueda, dividiendo el intervalo
+        de fechas published_after - published_before en subintervalos hasta que el número total de
+        articulos de cada uno de ellos no supere max_hits. Los subintervalos se consultan de forma
+        concurrente.
+        :param criteria: Debe ser una instancia de la clase SearchCriteria. Debe indicar al menos
+        el parámetro published_after. Si no se indica published_before, se usará la fecha actual.
+        Si es None, se podrán especificar los mismos parámetros que los que se utilizan para
+        inicializar una instancia de la clase SearchCriteria.
+        :param max_hits: Es el número máximo de articulos que se consultarán en una sola request.
+        Por defecto, 100
+        :param min_window: Es la duración mínima (instancia de datetime.timedelta) de un
+        subintervalo. Los intervalos más cortos (o de menos de 2 segundos) no se dividen aunque
+        superen max_hits.
+        :param max_workers: Es el número máximo de requests simultaneas. Por defecto, 4
+        :param timeout: Será el timeout de cada request, por defecto no habrá timeout.
+        :return: Devuelve una lista de articulos sin duplicados, ordenada por fecha de
+        publicación.
+        '''
+        try:
+            if criteria is None:
+                criteria = SearchCriteria(*args, **kwargs)
 
-            # Hacemos la request
-            result = self._request('articles', params, timeout)
+            if criteria.published_after is None:
+                raise Exception('published_after must be specified to split the search')
 
-            try:
-                articles = self._parse_articles_from_response(result)
-                return articles
-            except:
-                raise Exception('Failed to extract article data from JSON response')
+            params = criteria._parse()
+            self._resolve_sources(params)
+
+            def search_window(after, before, size):
+                window_params = copy(params)
+                window_params.update({
+                    'published_after' : SearchCriteria._format_date(after),
+                    'published_before' : SearchCriteria._format_date(before),
+                    'size' : size, 'since' : 0})
+                # Solo la request se realiza en el pool, los articulos se extraen en este hilo
+                return self._request('articles', window_params, timeout)
+
+            after = criteria.published_after
+            before = criteria.published_before if not criteria.published_before is None else \
+                datetime.utcnow().replace(microsecond = 0)
+
+            articles = {}
+            with ThreadPoolExecutor(max_workers = max_workers) as executor:
+                # Cada subintervalo se consulta con el tamaño máximo de página, salvo cuando se
+                # espera que deba volver a dividirse: en ese caso solo nos interesa el número total
+                # de articulos.
+                pending = {executor.submit(search_window, after, before, max_hits) : (after, before, max_hits)}
+                while len(pending) > 0:
+                    done, _ = wait(pending, return_when = FIRST_COMPLETED)
+                    for future in done:
+                        after, before, size = pending.pop(future)
+                        window_articles, total = self._parse_search_result(future.result())
+
+                        # La API solo admite fechas con precisión de segundos: un intervalo cuya
+                        # mitad no avanza no puede dividirse más
+                        middle = (after + (before - after) / 2).replace(microsecond = 0)
+
+                        if total <= max_hits or (before - after) <= min_window or middle <= after:
+                            if total > max_hits:
+                                self.logger.warning('Window {} - {} matched {} articles but only {} were returned'.format(
+                                    after, before, total, max_hits))
+
+                            if size < min(total, max_hits):
+                                # Solo habíamos consultado el número total de articulos
+                                pending[executor.submit(search_window, after, before, max_hits)] = (after, before, max_hits)
+                            else:
+                                articles.update((article.get_id(), article) for article in window_articles)
+                        else:
+                            # Dividimos el intervalo en dos mitades
+                            size = max_hits if total / 2 <= max_hits else 1
+                            self.logger.debug('Splitting window {} - {} ({} articles)'.format(after, before, total))
+                            for window in ((after, middle), (middle, before)):
+                                pending[executor.submit(search_window, *window, size)] = window + (size,)
+
+            return sorted(articles.values(), key = lambda article: article.get_published_at())
         except Exception as e:
             raise Exception('Request to BBC juice ({}) failed: {}'.format('articles', *e.args))
 
 
+    @accepts(object, criteria = SearchCriteria, since = int, limit = (int, type(None)),
+             page_size = (PageSizeController, type(None)), max_retries = int, backoff = (int, float))
+    def iter_articles(self, criteria = None, since = 0, limit = None, page_size = None,
+                      max_retries = 3, backoff = 0.5, timeout = None, *args, **kwargs):
+        '''
+        Pagina los articulos que cumplen un criterio de búsqueda. El tamaño de cada página lo
+        decide una instancia de la clase PageSizeController a partir del tiempo de respuesta
+        y tamaño de las respuestas anteriores.
+        :param criteria: Debe ser una instancia de la clase SearchCriteria.
+        Si es None, se podrán especificar los mismos parámetros que los que se utilizan para
+        inicializar una instancia de la clase SearchCriteria.
+        :param since: Es el offset del primer articulo. Por defecto, 0
+        :param limit: Si se indica, es el número máximo de articulos a devolver.
+        :param page_size: Es la instancia de PageSizeController que decide el tamaño de las páginas.
+        Si es None, se usará una con los valores por defecto. Puede consultarse después con
+        get_metrics() para conocer los tamaños elegidos.
+        :param max_retries: Es el número máximo de requests fallidas consecutivas antes de
+        abortar la paginación. Solo se reintentan las requests que fallan por timeout o por un
+        error del servidor (5xx); en ese caso se reduce el tamaño de página. Por defecto, 3
+        :param backoff: Es el tiempo en segundos que se espera antes del primer reintento. Se
+        duplica en cada reintento consecutivo. Por defecto, 0.5
+        :param timeout: Será el timeout de cada request, por defecto no habrá timeout.
+        :return: Es un generador que devuelve los articulos página a página (una lista de
+        articulos por página)
+        '''
+        if criteria is None:
+            criteria = SearchCriteria(*args, **kwargs)
+        if page_size is None:
+            page_size = PageSizeController()
+
+        try:
+            params = criteria._parse()
+            self._resolve_sources(params)
+        except Exception as e:
+            raise Exception('Request to BBC juice ({}) failed: {}'.format('articles', *e.args))
+
+        count, retries = 0, 0
+        while limit is None or count < limit:
+            size = page_size.get_size() if limit is None else min(page_size.get_size(), limit - count)
+            params.update({'size' : size, 'since' : since})
+
+            stats = {}
+            try:
+                articles, total = self._search(params, timeout, stats)
+            except Exception as e:
+                retryable = isinstance(e, requests.exceptions.Timeout) or \
+                    (isinstance(e, ServerResponseError) and e.status_code >= 500)
+                retries += 1
+                if not retryable or retries > max_retries:
+                    raise Exception('Request to BBC juice ({}) failed: {}'.format('articles', *e.args))
+
+                page_size.update(error = True)
+                delay = backoff * 2 ** (retries - 1)
+                self.logger.debug('Page request failed ({}), retrying in {}s with page size {}'.format(
+                    e, delay, page_size.get_size()))
+                sleep(delay)
+                continue
+
+            retries = 0
+            try:
+                page_size.update(latency = stats['latency'], num_bytes = stats['bytes'], count = len(articles))
+            except Exception as e:
+                raise Exception('Request to BBC juice ({}) failed: {}'.format('articles', *e.args))
+            self.logger.debug('Fetched {} articles in {:.3f}s ({} bytes), next page size: {}'.format(
+                len(articles), stats['latency'], stats['bytes'], page_size.get_size()))
+
+            if len(articles) == 0:
+                break
+            yield articles
+
+            since += len(articles)
+            count += len(articles)
+            if since >= total:
+                break
+
+
+    @accepts(object, criteria_list = list, size = int, since = int, max_workers = int)
+    def search_many(self, criteria_list, size = 10, since = 0, max_workers = 8, timeout = None, executor = None):
+        '''
+        Busca articulos para varios criterios de búsqueda a la vez. Los nombres de las fuentes de
+        información se traducen a IDs una sola vez, los criterios idénticos solo se consultan una
+        vez y las requests se realizan de forma concurrente.
+        Un error en uno de los criterios no afecta al resto.
+        :param criteria_list: Es una lista de instancias de la clase SearchCriteria
+        :param size: Es el número de articulos a devolver por cada criterio. Por defecto, 10
+        :param since: Es el offset del primer articulo a devolver. Por defecto, 0
+        :param max_workers: Es el número máximo de requests simultaneas. Por defecto, 8
+        :param timeout: Será el timeout de cada request, por defecto no habrá timeout.
+        :param executor: Si se indica, es el pool (una instancia de concurrent.futures.Executor) en
+        el que se realizarán las requests, de forma que pueda compartirse entre varias búsquedas por
+        lotes. En ese caso se ignora max_workers. Por defecto, se crea un pool para cada invocación.
+        :return: Devuelve un diccionario que asocia cada criterio de búsqueda con una instancia
+        de la clase BatchResult
+        Si algún elemento de criteria_list no es una instancia de SearchCriteria, se genera una
+        excepción sin realizar ninguna request.
+        '''
+        invalid = [criteria for criteria in criteria_list if not isinstance(criteria, SearchCriteria)]
+        if len(invalid) > 0:
+            raise ValueError('criteria_list must contain only SearchCriteria instances, got {}'.format(
+                ', '.join(sorted(set(type(criteria).__name__ for criteria in invalid)))))
+
+        results = {}
+
+        # Parseamos los criterios y agrupamos los que son idénticos
+        queries = OrderedDict()
+        for criteria in criteria_list:
+            try:
+                params = criteria._parse()
+                self._resolve_sources(params)
+                params.update({'size' : size, 'since' : since})
+            except Exception as e:
+                results[criteria] = BatchResult(criteria, error = e)
+                continue
+
+            key = tuple(sorted((key, tuple(value) if isinstance(value, list) else value)
+                               for key, value in params.items()))
+            queries.setdefault(key, (params, []))[1].append(criteria)
+
+        def search(params):
+            # Solo la request se realiza en el pool, los articulos se extraen en el hilo que
+            # invoca search_many
+            start = perf_counter()
+            try:
+                return self._request('articles', params, timeout), None, perf_counter() - start
+            except Exception as e:
+                return None, e, perf_counter() - start
+
+        pool = executor if not executor is None else ThreadPoolExecutor(max_workers = max_workers)
+        try:
+            futures = [(pool.submit(search, params), criteria_group) for params, criteria_group in queries.values()]
+            for future, criteria_group in futures:
+                result, error, elapsed = future.result()
+                articles = None
+                if error is None:
+                    try:
+                        articles, _ = self._parse_search_result(result)
+                    except Exception as e:
+                        error = e
+                for criteria in criteria_group:
+                    results[criteria] = BatchResult(criteria, articles, error, elapsed)
+        finally:
+            if executor is None:
+                pool.shutdown()
+
+        self.logger.debug('Batch search: {} criteria, {} requests'.format(len(criteria_list), len(queries)))
+        return results
+
+
+    @accepts(object, CrawlCoordinator, str, size = int, poll_interval = (int, float))
+    def crawl(self, coordinator, worker, size = 100, callback = None, poll_interval = 5, timeout = None):
+        '''
+        Procesa shards de un crawl (ver la clase CrawlCoordinator) hasta que no quede ninguna
+        pendiente. Pueden ejecutarse varios workers a la vez, en distintos procesos o máquinas,
+        sobre la misma cola de trabajo.
+        Mientras se procesa una shard, su préstamo se renueva periódicamente. Si se obtienen
+        size articulos y hay más resultados, se añade a la cola una shard con la siguiente página.
+        :param coordinator: Es la instancia de la clase CrawlCoordinator
+        :param worker: Es el identificador de este worker. Debe ser único.
+        :param size: Es el número de articulos a consultar por shard. Por defecto, 100
+        :param callback: Si se indica, se invoca con la lista de articulos de cada shard una vez
+        que su resultado se ha guardado en la cola. Los articulos que ya había guardado otra shard
+        no se incluyen.
+        :param poll_interval: Es el tiempo en segundos que se espera cuando todas las shards
+        restantes están en préstamo por otros workers. Por defecto, 5
+        :param timeout: Será el timeout de cada request, por defecto no habrá timeout.
+        :return: Devuelve el número de shards completadas por este worker
+        '''
+        completed = 0
+        while True:
+            shard = coordinator.lease(worker)
+            if shard is None:
+                if coordinator.get_progress()['leased'] == 0:
+                    break
+                # Esperamos por si expira el préstamo de otro worker
+                sleep(poll_interval)
+                continue
+
+            # Renovamos el préstamo en segundo plano mientras procesamos la shard
+            stop = Event()
+            def heartbeat():
+                while not stop.wait(coordinator.lease_time / 3):
+                    if not coordinator.heartbeat(shard):
+                        break
+            heartbeat_thread = Thread(target = heartbeat, daemon = True)
+            heartbeat_thread.start()
+
+            try:
+                articles, total = self._search(shard.get_params(size), timeout)
+            except Exception as e:
+                self.logger.warning('Shard {} failed: {}'.format(shard.get_id(), e))
+                coordinator.release(shard)
+                continue
+            finally:
+                stop.set()
+                heartbeat_thread.join()
+
+            next_since = shard.since + len(articles)
+            if len(articles) == 0 or next_since >= total:
+                next_since = None
+
+            new_ids = coordinator.commit(shard, [article.get_id() for article in articles], next_since)
+            if new_ids is None:
+                self.logger.warning('Lease on shard {} expired, result discarded'.format(shard.get_id()))
+                continue
+
+            completed += 1
+            if not callback is None:
+                new_ids = set(new_ids)
+                callback([article for article in articles if article.get_id() in new_ids])
+        return completed
+
+
+    def _resolve_sources(self, params):
+        '''
+        El parámetro sources[] solo puede tener IDs y no nombres. Este método reemplaza
+        los nombres de las fuentes de información de los parámetros de la query por sus IDs
+        :param params: Son los parámetros de la query, en forma de diccionario. Se modifican
+        in-place
+        '''
+        if ('sources[]' in params) and\
+                (isinstance(params['sources[]'], str) or (isinstance(params['sources[]'],list) and len([source for source in params['sources[]'] if isinstance(source, str)]) > 0)):
+            if self.sources is None:
+                try:
+                    self.sources = self.get_sources(timeout = 10)
+                except:
+                    raise Exception('Failed to fetch source info data')
+            if self.source_ids is None:
+                self.source_ids = dict((source.get_name(), source.get_id()) for source in self.sources)
+
+            try:
+                def get_source_id_by_name(name):
+                    if isinstance(name, int):
+                        return name
+                    return self.source_ids[name]
+
+                names = params['sources[]']
+                if isinstance(names, str):
+                    ids = get_source_id_by_name(names)
+                else:
+                    ids = [get_source_id_by_name(name) for name in names]
+
+                params['sources[]'] = ids
+            except:
+                raise Exception('Failed to translate source names to IDs')
+
+
+    def _search(self, params, timeout = None, stats = None):
+        '''
+        Realiza una request sobre el endpoint de articulos.
+        :param params: Son los parámetros de la query, con los nombres de las fuentes ya
+        traducidos a IDs
+        :param stats: Si se indica, debe ser un diccionario (ver el método _request)
+        :return: Devuelve una tupla con la lista de articulos y el número total de articulos
+        que cumplen el criterio de búsqueda
+        '''
+        return self._parse_search_result(self._request('articles', params, timeout, stats))
+
+
+    def _parse_search_result(self, result):
+        '''
+        Extrae los articulos del cuerpo de una respuesta del endpoint de articulos.
+        Las validaciones de pyvalid no son thread-safe, por lo que este método solo debe
+        invocarse desde un hilo a la vez.
+        :param result: Es el cuerpo de la respuesta decodificado (ver el método _request)
+        :return: Devuelve una tupla con la lista de articulos y el número total de articulos
+        que cumplen el criterio de búsqueda
+        '''
+        try:
+            articles = self._parse_articles_from_response(result)
+        except:
+            raise Exception('Failed to extract article data from JSON response')
+
+        total = result.get('total', len(articles)) if isinstance(result, dict) else len(articles)
+        return articles, int(total)
+
+
     def get_sources(self, timeout = None):
         '''
         Consulta las fuentes de información de la API BBC Juice
@@ -514,11 +1718,14 @@ class Juipy:
             raise Exception('Request to BBC juice ({}) failed: {}'.format('sources', *e.args))
 
 
-    def _request(self, endpoint, params = {}, timeout = None):
+    def _request(self, endpoint, params = {}, timeout = None, stats = None):
         '''
         Lanza una request sobre la API de BBC Juice.
         :param params: Son los parámetros de la request, en forma de diccionario
         (no se necesario especificar la clave API)
+        :param stats: Si se indica, debe ser un diccionario donde se guardarán el tiempo de
+        respuesta en segundos (clave 'latency') y el tamaño del cuerpo de la respuesta en bytes
+        (clave 'bytes'). Si el servidor responde 304, se indica el tamaño del cuerpo guardado.
         :return: Devuelve el cuerpo de la respuesta codificado en JSON
         '''
         params = copy(params)
@@ -537,22 +1744,77 @@ class Juipy:
         query = '{}/{}?{}'.format(self.root_url, endpoint, urlencode(params))
         self.logger.debug('URL encoded: {}'.format(query))
 
+        # Las respuestas se indexan por la query normalizada (sin la API key)
+        cache_key = '{}?{}'.format(endpoint, urlencode(sorted(
+            [(key, value) for key, value in params if key != 'api_key'], key = lambda x: (x[0], str(x[1])))))
+
+        headers = {'Accept-Encoding' : 'gzip, deflate'}
+        with self.http_cache_lock:
+            cached = self.http_cache.get(cache_key)
+        if not cached is None:
+            if not cached['etag'] is None:
+                headers['If-None-Match'] = cached['etag']
+            if not cached['last_modified'] is None:
+                headers['If-Modified-Since'] = cached['last_modified']
+
         # Hacemos la request
-        response = requests.get(query, timeout = timeout)
+        start = perf_counter()
+        response = self.transport.get(query, headers = headers, timeout = timeout)
+        latency = perf_counter() - start
 
         # Comprobamos que la respuesta tiene código 200
         self.logger.debug('Response status code: {}'.format(response.status_code))
         self.logger.debug('Response headers: {}'.format(response.headers))
 
+        if response.status_code == 304 and not cached is None:
+            # El contenido no ha cambiado, devolvemos la respuesta anterior
+            with self.http_cache_lock:
+                self.http_cache.move_to_end(cache_key)
+                self.transfer_stats['requests'] += 1
+                self.transfer_stats['not_modified'] += 1
+                self.transfer_stats['bytes_saved_not_modified'] += cached['bytes']
+
+            if not stats is None:
+                # Indicamos el tamaño del cuerpo que se habría recibido
+                stats['latency'] = latency
+                stats['bytes'] = cached['body_bytes']
+            return cached['result']
+
         if response.status_code != 200:
-            raise Exception('Server response with {}'.format(response.status_code))
+            raise ServerResponseError(response.status_code)
+
+        # Bytes transferidos (comprimidos) y bytes del cuerpo de la respuesta
+        body_bytes = len(response.content)
+        wire_bytes = body_bytes
+        if response.headers.get('Content-Encoding', '').lower() in ('gzip', 'deflate') and\
+                response.headers.get('Content-Length', '').isdigit():
+            wire_bytes = int(response.headers['Content-Length'])
+
+        if not stats is None:
+            stats['latency'] = latency
+            stats['bytes'] = body_bytes
 
         try:
             result = response.json()
-            return result
         except:
             raise Exception('Failed to decode response to JSON')
 
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        with self.http_cache_lock:
+            self.transfer_stats['requests'] += 1
+            self.transfer_stats['bytes_received'] += wire_bytes
+            self.transfer_stats['bytes_saved_compression'] += max(body_bytes - wire_bytes, 0)
+
+            if self.http_cache_size > 0 and (not etag is None or not last_modified is None):
+                self.http_cache[cache_key] = {'etag' : etag, 'last_modified' : last_modified,
+                                              'result' : result, 'bytes' : wire_bytes,
+                                              'body_bytes' : body_bytes}
+                self.http_cache.move_to_end(cache_key)
+                while len(self.http_cache) > self.http_cache_size:
+                    self.http_cache.popitem(last = False)
+
+        return result
+
 
     @staticmethod
     def _parse_articles_from_response(response):
@@ -566,7 +1828,7 @@ class Juipy:
             url = data['url']
             id = int(data['id'])
             published_at = datetime.strptime(data['first_published_or_seen_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
-            article = Article(id, url, published_at)
+            article = Article(id, url, published_at, data)
 
             return article
 
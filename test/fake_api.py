@@ -0,0 +1,84 @@
+'''
+Copyright (c) 2017 Víctor Ruiz Gómez
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+'''
+Transporte que simula la API BBC Juice sobre un corpus en memoria, usado por las pruebas.
+'''
+
+import json
+from datetime import datetime
+from hashlib import md5
+from urllib.parse import parse_qs
+from juipy import *
+
+
+class FakeTransport(Transport):
+    '''
+    Simula el endpoint de articulos de la API BBC Juice. Si etags es True, las respuestas
+    incluyen la cabecera ETag y las requests con If-None-Match se responden con 304 cuando
+    el cuerpo no ha cambiado.
+    failures es una lista de códigos de estado o excepciones con los que se responde a las
+    primeras requests.
+    '''
+    date_format = '%Y-%m-%dT%H:%M:%SZ'
+
+    def __init__(self, hits, etags = False, failures = ()):
+        self.hits = hits
+        self.etags = etags
+        self.failures = list(failures)
+        self.requests = 0
+
+    def get(self, url, headers = None, timeout = None):
+        self.requests += 1
+        if len(self.failures) > 0:
+            failure = self.failures.pop(0)
+            if isinstance(failure, Exception):
+                raise failure
+            return TransportResponse(failure, {}, b'')
+
+        params = parse_qs(url.partition('?')[2])
+        matches = self.hits
+        if 'published_after' in params:
+            after = datetime.strptime(params['published_after'][0], self.date_format)
+            matches = [hit for hit in matches if hit['published_at'] >= after]
+        if 'published_before' in params:
+            before = datetime.strptime(params['published_before'][0], self.date_format)
+            matches = [hit for hit in matches if hit['published_at'] <= before]
+        if 'sources[]' in params:
+            sources = [int(source) for source in params['sources[]']]
+            matches = [hit for hit in matches if hit.get('source') in sources]
+        if 'q' in params:
+            matches = [hit for hit in matches if hit['title'] == params['q'][0]]
+
+        since, size = int(params['since'][0]), int(params['size'][0])
+        body = {'total' : len(matches), 'hits' : [{
+            'id' : hit['id'], 'url' : 'http://example.com/{}'.format(hit['id']), 'title' : hit['title'],
+            'first_published_or_seen_at' : hit['published_at'].strftime('%Y-%m-%dT%H:%M:%S.%fZ')}
+            for hit in matches[since:since + size]]}
+        content = json.dumps(body).encode('utf-8')
+
+        response_headers = {'Content-Type' : 'application/json'}
+        if self.etags:
+            etag = '"{}"'.format(md5(content).hexdigest())
+            if (headers or {}).get('If-None-Match') == etag:
+                return TransportResponse(304, {'ETag' : etag}, b'')
+            response_headers['ETag'] = etag
+        return TransportResponse(200, response_headers, content)
@@ -0,0 +1,87 @@
+'''
+Copyright (c) 2017 Víctor Ruiz Gómez
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+'''
+Comprueba que las búsquedas concurrentes devuelven todos los articulos, usando un
+transporte que simula la API BBC Juice sobre un corpus en memoria.
+'''
+
+import unittest
+import sys
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from juipy import *
+from .fake_api import FakeTransport
+
+
+class ConcurrencyTest(unittest.TestCase):
+    start = datetime(2017, 9, 1)
+
+    def setUp(self):
+        hits = [{'id' : id, 'title' : 'keyword{}'.format(id % 100),
+                 'published_at' : self.start + timedelta(minutes = 7 * id)} for id in range(1000)]
+        self.juipy = Juipy(api_key = 'key', transport = FakeTransport(hits))
+
+        # Forzamos cambios de contexto frecuentes entre hilos
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def test_search_all_articles_is_complete(self):
+        criteria = SearchCriteria(published_after = self.start, published_before = self.start + timedelta(days = 7))
+        for _ in range(10):
+            articles = self.juipy.search_all_articles(criteria = criteria, max_hits = 20, max_workers = 16)
+            self.assertEqual({article.get_id() for article in articles}, set(range(1000)))
+
+    def test_search_many_is_complete(self):
+        criteria_list = [SearchCriteria(keywords = 'keyword{}'.format(id)) for id in range(100)]
+        for _ in range(3):
+            results = self.juipy.search_many(criteria_list, size = 10, max_workers = 16)
+            for id, criteria in enumerate(criteria_list):
+                self.assertTrue(results[criteria].succeeded())
+                self.assertEqual({article.get_id() for article in results[criteria].get_articles()},
+                                 set(range(id, 1000, 100)))
+
+    def test_search_many_shared_executor(self):
+        criteria_list = [SearchCriteria(keywords = 'keyword{}'.format(id)) for id in range(10)]
+        with ThreadPoolExecutor(max_workers = 4) as executor:
+            for _ in range(2):
+                results = self.juipy.search_many(criteria_list, size = 10, executor = executor)
+                self.assertTrue(all(results[criteria].succeeded() for criteria in criteria_list))
+
+    def test_search_many_rejects_invalid_items(self):
+        with self.assertRaises(ValueError):
+            self.juipy.search_many([SearchCriteria(keywords = 'keyword0'), {}])
+
+    def test_search_all_articles_stops_splitting_at_one_second(self):
+        hits = [{'id' : id, 'title' : 'keyword', 'published_at' : self.start + timedelta(seconds = 1)} for id in range(30)]
+        self.juipy = Juipy(api_key = 'key', transport = FakeTransport(hits))
+        criteria = SearchCriteria(published_after = self.start + timedelta(seconds = 1),
+                                  published_before = self.start + timedelta(seconds = 2))
+        articles = self.juipy.search_all_articles(criteria = criteria, max_hits = 10,
+                                                  min_window = timedelta(microseconds = 1))
+        self.assertEqual(len(articles), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
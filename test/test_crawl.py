@@ -0,0 +1,114 @@
+'''
+Copyright (c) 2017 Víctor Ruiz Gómez
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+'''
+Comprueba el reparto de un crawl entre varios workers con CrawlCoordinator.
+'''
+
+import unittest
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import sleep
+from juipy import *
+from .fake_api import FakeTransport
+
+
+start = datetime(2017, 9, 1)
+hits = [{'id' : id, 'title' : 'keyword', 'source' : 1 + id % 2,
+         'published_at' : start + timedelta(minutes = 10 * id)} for id in range(100)]
+sources = [Source(1, 'El Pais'), Source(2, 'La Vanguardia Digital')]
+
+
+def create_juipy():
+    juipy = Juipy(api_key = 'key', transport = FakeTransport(hits))
+    juipy.sources = sources
+    return juipy
+
+
+def run_worker(path, worker):
+    with CrawlCoordinator(path, lease_time = 1) as coordinator:
+        create_juipy().crawl(coordinator, worker, size = 4, poll_interval = 0.1)
+
+
+class CrawlTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = join(self.directory.name, 'crawl.db')
+        self.criteria = SearchCriteria(sources = ['El Pais', 'La Vanguardia Digital'], published_after = start,
+                                       published_before = start + timedelta(minutes = 10 * 100))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_plan_is_idempotent(self):
+        with CrawlCoordinator(self.path) as coordinator:
+            self.assertEqual(coordinator.plan(create_juipy(), self.criteria, window = timedelta(hours = 1)), 34)
+            self.assertEqual(coordinator.plan(create_juipy(), self.criteria, window = timedelta(hours = 1)), 0)
+
+    def test_crawl_with_several_workers(self):
+        with CrawlCoordinator(self.path, lease_time = 1) as coordinator:
+            coordinator.plan(create_juipy(), self.criteria, window = timedelta(hours = 1))
+
+            # Un worker obtiene una shard y deja de responder
+            crashed = coordinator.lease('crashed')
+
+            context = get_context('fork')
+            workers = [context.Process(target = run_worker, args = (self.path, 'worker{}'.format(id))) for id in range(3)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join(30)
+                self.assertEqual(worker.exitcode, 0)
+
+            progress = coordinator.get_progress()
+            self.assertEqual(progress['pending'] + progress['leased'] + progress['failed'], 0)
+            self.assertEqual(sorted(coordinator.get_article_ids()), list(range(100)))
+
+            # El préstamo del worker caído expiró y otro worker completó su shard
+            self.assertIsNone(coordinator.commit(crashed, [0]))
+
+    def test_lease_heartbeat_and_release(self):
+        with CrawlCoordinator(self.path, lease_time = 0.5, max_attempts = 2) as coordinator:
+            coordinator.plan(create_juipy(), SearchCriteria(published_after = start,
+                                                            published_before = start + timedelta(hours = 1)))
+            shard = coordinator.lease('a')
+            self.assertIsNone(coordinator.lease('b'))
+
+            # El préstamo se mantiene mientras se renueva
+            for _ in range(3):
+                sleep(0.3)
+                self.assertTrue(coordinator.heartbeat(shard))
+            self.assertIsNone(coordinator.lease('b'))
+
+            # Al liberarla vuelve a la cola, y tras max_attempts intentos se marca como fallida
+            coordinator.release(shard)
+            shard = coordinator.lease('b')
+            self.assertIsNotNone(shard)
+            self.assertFalse(coordinator.heartbeat(CrawlShard(shard.get_id(), shard.params, shard.since, 'a')))
+            coordinator.release(shard)
+            self.assertIsNone(coordinator.lease('c'))
+            self.assertEqual(coordinator.get_progress()['failed'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+'''
+Copyright (c) 2017 Víctor Ruiz Gómez
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+'''
+Comprueba las requests condicionales (ETag / 304 Not Modified) y las estadísticas de
+transferencia de la clase Juipy.
+'''
+
+import unittest
+from datetime import datetime, timedelta
+from juipy import *
+from .fake_api import FakeTransport
+
+
+class CompressedTransport(Transport):
+    '''
+    Devuelve las respuestas de otro transporte como si se hubieran recibido comprimidas
+    a la mitad de su tamaño
+    '''
+    def __init__(self, transport):
+        self.transport = transport
+
+    def get(self, url, headers = None, timeout = None):
+        response = self.transport.get(url, headers = headers, timeout = timeout)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Content-Length'] = str(len(response.content) // 2)
+        return response
+
+
+class HttpCacheTest(unittest.TestCase):
+    start = datetime(2017, 9, 1)
+
+    def setUp(self):
+        hits = [{'id' : id, 'title' : 'keyword{}'.format(id % 3),
+                 'published_at' : self.start + timedelta(minutes = id)} for id in range(40)]
+        self.transport = FakeTransport(hits, etags = True)
+
+    def search(self, juipy, keywords):
+        return [article.get_id() for article in juipy.search_articles(keywords = keywords)]
+
+    def test_not_modified(self):
+        juipy = Juipy(api_key = 'key', transport = self.transport)
+        first = self.search(juipy, 'keyword0')
+        self.assertEqual(self.search(juipy, 'keyword0'), first)
+
+        stats = juipy.get_transfer_stats()
+        self.assertEqual(stats['requests'], 2)
+        self.assertEqual(stats['not_modified'], 1)
+        self.assertGreater(stats['bytes_received'], 0)
+        self.assertEqual(stats['bytes_saved_not_modified'], stats['bytes_received'])
+
+    def test_lru_eviction(self):
+        juipy = Juipy(api_key = 'key', transport = self.transport, http_cache_size = 2)
+        for keywords in ('keyword0', 'keyword1', 'keyword0', 'keyword2'):
+            self.search(juipy, keywords)
+        self.assertEqual(juipy.get_transfer_stats()['not_modified'], 1)
+
+        # keyword1 es la respuesta usada hace más tiempo, por lo que se descartó
+        self.assertEqual(len(juipy.http_cache), 2)
+        self.search(juipy, 'keyword1')
+        self.search(juipy, 'keyword2')
+        self.assertEqual(juipy.get_transfer_stats()['not_modified'], 2)
+
+    def test_disabled(self):
+        juipy = Juipy(api_key = 'key', transport = self.transport, http_cache_size = 0)
+        self.search(juipy, 'keyword0')
+        self.search(juipy, 'keyword0')
+        self.assertEqual(len(juipy.http_cache), 0)
+        self.assertEqual(juipy.get_transfer_stats()['not_modified'], 0)
+
+    def test_compression_stats(self):
+        juipy = Juipy(api_key = 'key', transport = CompressedTransport(self.transport), http_cache_size = 0)
+        self.search(juipy, 'keyword0')
+        stats = juipy.get_transfer_stats()
+        self.assertGreater(stats['bytes_saved_compression'], 0)
+        self.assertAlmostEqual(stats['bytes_saved_compression'], stats['bytes_received'], delta = 1)
+
+    def test_iter_articles_with_byte_budget(self):
+        juipy = Juipy(api_key = 'key', transport = self.transport)
+        for run in range(2):
+            controller = PageSizeController(initial_size = 4, max_bytes = 100000)
+            pages = list(juipy.iter_articles(keywords = 'keyword0', page_size = controller))
+            self.assertEqual(sum(len(page) for page in pages), 14)
+            # Las requests de la segunda paginación se responden con 304
+            self.assertGreater(controller.get_metrics()['mean_bytes'], 0)
+        stats = juipy.get_transfer_stats()
+        self.assertEqual(stats['not_modified'], stats['requests'] // 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+'''
+Copyright (c) 2017 Víctor Ruiz Gómez
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+'''
+Comprueba la evaluación local de criterios de búsqueda con ArticleIndex.
+'''
+
+import unittest
+from datetime import datetime
+from juipy import *
+
+
+def create_article(id, published_at, **data):
+    return Article(id, 'http://example.com/{}'.format(id), published_at, data)
+
+
+class ArticleIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = ArticleIndex()
+        self.index.add([
+            create_article(1, datetime(2017, 9, 1), title = 'Barack Obama visita Madrid',
+                           body = 'Cumbre sobre el cambio climático', lang = 'es',
+                           annotations = [{'uri' : 'http://dbpedia.org/resource/Barack_Obama'}],
+                           source = {'id' : 1, 'name' : 'El Pais'}),
+            create_article(2, datetime(2017, 9, 2), title = 'Obama y Trump',
+                           description = 'Donald Trump habla del clima', lang = 'en',
+                           annotations = ['http://dbpedia.org/resource/Donald_Trump'], source = 2),
+            create_article(3, datetime(2017, 9, 3), title = 'Elecciones en Cataluña')
+        ])
+
+    def search(self, **kwargs):
+        return [article.get_id() for article in self.index.search(**kwargs)]
+
+    def test_phrases(self):
+        self.assertEqual(self.search(keywords = 'Barack Obama'), [1])
+        self.assertEqual(self.search(keywords = 'Obama Barack'), [])
+        self.assertEqual(self.search(keywords = 'obama'), [1, 2])
+        # Las frases no continúan de un campo al siguiente
+        self.assertEqual(self.search(keywords = 'Madrid Cumbre'), [])
+
+    def test_formulas(self):
+        self.assertEqual(self.search(keywords = Keyword('Obama') & Keyword('Trump')), [2])
+        self.assertEqual(self.search(keywords = Keyword('Madrid') | Keyword('Cataluña')), [1, 3])
+        self.assertEqual(self.search(keywords = (Keyword('Barack Obama') | Keyword('Donald Trump')) & Keyword('clima')), [2])
+        self.assertEqual(self.search(keywords = ['obama', 'madrid']), [1])
+
+    def test_facets(self):
+        self.assertEqual(self.search(facets = 'Donald_Trump'), [2])
+        self.assertEqual(self.search(facets = ['Barack_Obama', 'Donald_Trump']), [1, 2])
+        self.assertEqual(self.search(keywords = 'obama', facets = 'Barack_Obama'), [1])
+
+    def test_filters(self):
+        self.assertEqual(self.search(published_after = datetime(2017, 9, 2)), [2, 3])
+        self.assertEqual(self.search(published_before = datetime(2017, 9, 2)), [1, 2])
+        # Los articulos sin lenguaje o sin fuente no cumplen esos filtros
+        self.assertEqual(self.search(lang = 'es'), [1])
+        self.assertEqual(self.search(sources = 'El Pais'), [1])
+        self.assertEqual(self.search(sources = [1, 2]), [1, 2])
+
+    def test_remove_and_add(self):
+        self.index.remove(1)
+        self.assertEqual(self.search(keywords = 'obama'), [2])
+        self.assertEqual(self.search(facets = 'Barack_Obama'), [])
+        self.assertEqual(len(self.index), 2)
+
+        # Al añadir de nuevo un articulo, se reemplaza su versión anterior
+        self.index.add(create_article(2, datetime(2017, 9, 2), title = 'Barack Obama'))
+        self.assertEqual(self.search(keywords = 'Trump'), [])
+        self.assertEqual(self.search(keywords = 'Barack Obama'), [2])
+        self.assertEqual(len(self.index), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+'''
+Copyright (c) 2017 Víctor Ruiz Gómez
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+'''
+Comprueba el ajuste del tamaño de página con PageSizeController y la paginación de
+articulos con Juipy.iter_articles.
+'''
+
+import unittest
+import requests
+from datetime import datetime, timedelta
+from juipy import *
+from .fake_api import FakeTransport
+
+
+class PageSizeControllerTest(unittest.TestCase):
+    def test_bounds(self):
+        with self.assertRaises(ValueError):
+            PageSizeController(initial_size = 200, max_size = 100)
+        PageSizeController(max_error_rate = 0)
+
+        controller = PageSizeController(initial_size = 60, min_size = 5, max_size = 100, target_latency = 1.0)
+        for _ in range(5):
+            controller.update(latency = 0.01, num_bytes = 1000, count = controller.get_size())
+        self.assertEqual(controller.get_size(), 100)
+        for _ in range(10):
+            controller.update(error = True)
+        self.assertEqual(controller.get_size(), 5)
+
+    def test_growth(self):
+        controller = PageSizeController(initial_size = 10, target_latency = 1.0)
+        self.assertEqual(controller.update(latency = 0.1, num_bytes = 1000, count = 10), 20)
+        self.assertEqual(controller.update(latency = 0.8, num_bytes = 1000, count = 20), 25)
+        # No se crece si la página no se llenó
+        self.assertEqual(controller.update(latency = 0.1, num_bytes = 1000, count = 3), 25)
+
+    def test_shrinking(self):
+        controller = PageSizeController(initial_size = 40, target_latency = 1.0)
+        self.assertEqual(controller.update(latency = 1.6, num_bytes = 1000, count = 40), 25)
+        self.assertEqual(controller.update(latency = 10, num_bytes = 1000, count = 25), 12)
+        self.assertEqual(controller.update(error = True), 6)
+        # Tras un error no se crece hasta que la tasa de errores baja
+        self.assertEqual(controller.update(latency = 0.1, num_bytes = 1000, count = 6), 6)
+
+        metrics = controller.get_metrics()
+        self.assertEqual(metrics['sizes'], [40, 25, 12, 6])
+        self.assertEqual(metrics['errors'], 1)
+
+    def test_byte_budget(self):
+        controller = PageSizeController(initial_size = 50, target_latency = 1.0, max_bytes = 10000)
+        # 50 articulos en 50000 bytes: 1000 bytes por articulo
+        self.assertEqual(controller.update(latency = 0.1, num_bytes = 50000, count = 50), 10)
+        # Una respuesta sin cuerpo (p.ej, 304) no aplica el límite
+        self.assertEqual(controller.update(latency = 0.1, num_bytes = 0, count = 10), 20)
+
+
+class IterArticlesTest(unittest.TestCase):
+    start = datetime(2017, 9, 1)
+
+    def create_juipy(self, failures = ()):
+        hits = [{'id' : id, 'title' : 'keyword', 'published_at' : self.start + timedelta(minutes = id)}
+                for id in range(50)]
+        self.transport = FakeTransport(hits, failures = failures)
+        return Juipy(api_key = 'key', transport = self.transport)
+
+    def test_pages(self):
+        juipy = self.create_juipy()
+        pages = list(juipy.iter_articles(keywords = 'keyword'))
+        self.assertEqual([article.get_id() for page in pages for article in page], list(range(50)))
+
+    def test_retries_server_errors(self):
+        juipy = self.create_juipy(failures = [503, requests.exceptions.Timeout()])
+        controller = PageSizeController(initial_size = 20)
+        pages = list(juipy.iter_articles(keywords = 'keyword', page_size = controller, backoff = 0.01))
+        self.assertEqual(sum(len(page) for page in pages), 50)
+        self.assertEqual(controller.get_metrics()['sizes'][:3], [20, 10, 5])
+
+    def test_does_not_retry_client_errors(self):
+        juipy = self.create_juipy(failures = [404])
+        with self.assertRaises(Exception):
+            list(juipy.iter_articles(keywords = 'keyword', backoff = 0.01))
+        self.assertEqual(self.transport.requests, 1)
+
+    def test_gives_up_after_max_retries(self):
+        juipy = self.create_juipy(failures = [500] * 10)
+        with self.assertRaises(Exception):
+            list(juipy.iter_articles(keywords = 'keyword', max_retries = 2, backoff = 0.01))
+        self.assertEqual(self.transport.requests, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+'''
+Copyright (c) 2017 Víctor Ruiz Gómez
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+'''
+Comprueba que las respuestas grabadas con RecordingTransport se reproducen con
+ReplayTransport.
+'''
+
+import unittest
+from datetime import datetime, timedelta
+from os.path import join
+from tempfile import TemporaryDirectory
+from juipy import *
+from .fake_api import FakeTransport
+
+
+class TransportTest(unittest.TestCase):
+    start = datetime(2017, 9, 1)
+
+    def setUp(self):
+        self.hits = [{'id' : id, 'title' : 'keyword{}'.format(id % 2),
+                      'published_at' : self.start + timedelta(minutes = id)} for id in range(20)]
+        self.directory = TemporaryDirectory()
+        self.path = join(self.directory.name, 'recording.bin')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def record(self):
+        '''
+        Graba dos búsquedas idénticas y una distinta con un cliente que realiza
+        requests condicionales
+        :return: Devuelve las IDs de los articulos de cada búsqueda
+        '''
+        with RecordingTransport(self.path, FakeTransport(self.hits, etags = True)) as transport:
+            juipy = Juipy(api_key = 'secret', transport = transport)
+            return [[article.get_id() for article in juipy.search_articles(keywords = keywords)]
+                    for keywords in ('keyword0', 'keyword0', 'keyword1')]
+
+    def replay(self, transport, http_cache_size = 256):
+        juipy = Juipy(api_key = 'other', transport = transport, http_cache_size = http_cache_size)
+        return [[article.get_id() for article in juipy.search_articles(keywords = keywords)]
+                for keywords in ('keyword0', 'keyword0', 'keyword1')]
+
+    def test_replay(self):
+        recorded = self.record()
+        for http_cache_size in (0, 256):
+            with ReplayTransport(self.path) as transport:
+                self.assertEqual(self.replay(transport, http_cache_size), recorded)
+
+    def test_replay_truncated_recording(self):
+        recorded = self.record()
+
+        # Eliminamos el índice, como si la grabación no se hubiera cerrado
+        with open(self.path, 'rb') as file:
+            data = file.read()
+        index_offset, _ = RecordingTransport.trailer.unpack_from(data, len(data) - RecordingTransport.trailer.size)
+        with open(self.path, 'wb') as file:
+            file.write(data[:index_offset])
+
+        with ReplayTransport(self.path) as transport:
+            self.assertEqual(self.replay(transport, 0), recorded)
+
+    def test_replay_unknown_request(self):
+        self.record()
+        with ReplayTransport(self.path) as transport:
+            juipy = Juipy(api_key = 'other', transport = transport)
+            with self.assertRaises(Exception):
+                juipy.search_articles(keywords = 'unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()